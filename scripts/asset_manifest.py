@@ -0,0 +1,168 @@
+"""
+Asset Manifest - Verified, cached catalogue of the images in assets/
+"""
+import hashlib
+import json
+import os
+import struct
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+HASH_CHUNK_SIZE = 1 << 16
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+                    0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _read_png_size(f) -> Optional[Tuple[int, int]]:
+    """Read width/height from the IHDR chunk of a PNG"""
+    header = f.read(24)
+    if len(header) < 24 or header[12:16] != b'IHDR':
+        return None
+    return struct.unpack('>II', header[16:24])
+
+
+def _read_jpeg_size(f) -> Optional[Tuple[int, int]]:
+    """Walk JPEG segments until a start-of-frame marker gives the size"""
+    while True:
+        byte = f.read(1)
+        while byte and byte != b'\xff':
+            byte = f.read(1)
+        while byte == b'\xff':
+            byte = f.read(1)
+        if not byte:
+            return None
+        marker = byte[0]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            continue
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack('>H', length_bytes)[0]
+        if marker in JPEG_SOF_MARKERS:
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack('>HH', frame[1:5])
+            return width, height
+        f.seek(length - 2, 1)
+
+
+def read_image_size(f) -> Optional[Tuple[int, int]]:
+    """Decode just enough of a PNG or JPEG header to get (width, height)"""
+    signature = f.read(8)
+    if signature == PNG_SIGNATURE:
+        f.seek(0)
+        return _read_png_size(f)
+    if signature[:2] == b'\xff\xd8':
+        f.seek(2)
+        return _read_jpeg_size(f)
+    return None
+
+
+def _inspect_asset(path: Path) -> Dict:
+    """Stat, header-decode and hash a single asset"""
+    try:
+        stat = path.stat()
+    except OSError:
+        return {"exists": False}
+
+    entry = {
+        "exists": True,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "width": None,
+        "height": None,
+        "sha256": None
+    }
+    try:
+        with open(path, 'rb') as f:
+            try:
+                size = read_image_size(f)
+            except struct.error:
+                size = None
+            if size:
+                entry["width"], entry["height"] = size
+
+            f.seek(0)
+            digest = hashlib.sha256()
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+            entry["sha256"] = digest.hexdigest()
+    except OSError:
+        pass
+    return entry
+
+
+def _refresh_entry(path: Path, cached: Optional[Dict]) -> Dict:
+    """Reuse the cached entry when the file's mtime and size are unchanged"""
+    if cached and cached.get('exists'):
+        try:
+            stat = path.stat()
+        except OSError:
+            return {"exists": False}
+        if stat.st_mtime_ns == cached.get('mtime_ns') and stat.st_size == cached.get('size'):
+            return cached
+    return _inspect_asset(path)
+
+
+def _load_cache(cache_path: Optional[Path]) -> Dict[str, Dict]:
+    """Load a previously written manifest, ignoring unreadable caches"""
+    if cache_path and cache_path.exists():
+        try:
+            with open(cache_path, 'r') as f:
+                return json.load(f).get('assets', {})
+        except (OSError, ValueError):
+            return {}
+    return {}
+
+
+def _write_cache(cache_path: Path, manifest: Dict[str, Dict]) -> None:
+    """Write the manifest to a temp file and move it into place.
+
+    Builders running side by side never see a half-written cache; the last
+    writer wins.
+    """
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=cache_path.parent, prefix=cache_path.name, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump({"assets": manifest}, f, indent=2, sort_keys=True)
+        os.replace(tmp_name, cache_path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+
+def build_manifest(assets_dir: Path, filenames: Iterable[str],
+                   cache_path: Optional[Path] = None,
+                   max_workers: Optional[int] = None) -> Dict[str, Dict]:
+    """Build the manifest for ``filenames`` in ``assets_dir``.
+
+    Files are checked in a thread pool. Entries in ``cache_path`` are reused
+    when mtime and size still match, and the refreshed manifest is written
+    back to it.
+    """
+    cached = _load_cache(cache_path)
+    filenames = sorted(set(filenames))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        entries = pool.map(
+            lambda name: _refresh_entry(assets_dir / name, cached.get(name)),
+            filenames
+        )
+        manifest = dict(zip(filenames, entries))
+
+    if cache_path and manifest != cached:
+        _write_cache(cache_path, manifest)
+
+    return manifest
+
+
+def is_usable(entry: Optional[Dict], min_width: int = 0, min_height: int = 0) -> bool:
+    """True if the asset exists, decodes, and meets the minimum dimensions"""
+    if not entry or not entry.get('exists') or not entry.get('width'):
+        return False
+    return entry['width'] >= min_width and entry['height'] >= min_height
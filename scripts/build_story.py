@@ -6,6 +6,17 @@ import json
 import argparse
 from pathlib import Path
 from story_builder import StoryBuilder
+from story_delta import diff_packs, next_base_version
+
+
+def _read_json(path: Path):
+    """Load a JSON object from path, or None if it is missing or malformed"""
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return data if isinstance(data, dict) else None
 
 
 def main():
@@ -17,6 +28,16 @@ def main():
                        help='Output story pack JSON file')
     parser.add_argument('--weights', 
                        help='Weights configuration file')
+    parser.add_argument('--asset-manifest', default='out/asset_manifest.json',
+                       help='Cached asset manifest JSON file')
+    parser.add_argument('--shared-index',
+                       help='Attach to a published squad/asset index instead of parsing them')
+    parser.add_argument('--publish-shared-index',
+                       help='Publish the squad/asset index to this file and exit')
+    parser.add_argument('--delta', action='store_true',
+                       help='Also write a patch against the previously written pack')
+    parser.add_argument('--patch-output', default='out/story.patch.json',
+                       help='Output patch JSON file (used with --delta)')
     
     args = parser.parse_args()
     
@@ -52,21 +73,64 @@ def main():
                 print(f"Error: Weights file not found: {weights_path}")
                 return 1
     
+    if args.publish_shared_index:
+        index_path = base_path / args.publish_shared_index
+        builder = StoryBuilder(weights_path, manifest_path=base_path / args.asset_manifest)
+        builder.publish_shared_index(index_path)
+        print(f"Shared index published: {index_path}")
+        return 0
+    
+    shared_index_path = None
+    if args.shared_index:
+        shared_index_path = base_path / args.shared_index
+        if not shared_index_path.exists():
+            print(f"Error: Shared index not found: {shared_index_path}")
+            return 1
+    
     # Build story
-    builder = StoryBuilder(weights_path)
-    story = builder.build_story(events_path)
+    try:
+        builder = StoryBuilder(weights_path, manifest_path=base_path / args.asset_manifest,
+                               shared_index_path=shared_index_path)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    with builder:
+        story = builder.build_story(events_path)
     
     # Ensure output directory exists
     output_path.parent.mkdir(parents=True, exist_ok=True)
     
-    # Write output
+    # Diff against the previous pack before it is overwritten
+    patch = None
+    if args.delta and not output_path.exists():
+        print(f"No previous pack at {output_path}; skipping delta output")
+    elif args.delta:
+        patch_path = base_path / args.patch_output
+        previous_story = _read_json(output_path)
+        if previous_story is None:
+            print(f"Previous pack at {output_path} is unreadable; skipping delta output")
+        else:
+            previous_patch = _read_json(patch_path) if patch_path.exists() else None
+            base_version = next_base_version(previous_patch, previous_story)
+            patch = diff_packs(previous_story, story, base_version)
+    
+    # Write output, then the patch that describes it
     with open(output_path, 'w') as f:
         json.dump(story, f, indent=2)
     
+    if patch is not None:
+        patch_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(patch_path, 'w') as f:
+            json.dump(patch, f, indent=2)
+    
     print(f"Story pack created: {output_path}")
     print(f"  - {len(story['pages'])} pages")
     print(f"  - {story['metrics']['highlights']} highlights")
     print(f"  - {story['metrics']['goals']} goals")
+    if patch is not None:
+        print(f"Story patch created: {base_path / args.patch_output}")
+        print(f"  - version {patch['base_version']} -> {patch['version']}")
+        print(f"  - {len(patch['ops'])} page operations")
 
 
 if __name__ == '__main__':
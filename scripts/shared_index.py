@@ -0,0 +1,249 @@
+"""
+Shared Index - Read-only squad and asset indexes in an mmap'd file
+
+The layout is a string table plus offset arrays, so any number of worker
+processes can attach to the same file and share its pages without parsing
+or copying it. All integers are little-endian uint32:
+
+    header   magic, version, string count, player count, asset count
+    offsets  [strings + 1]  byte offsets into the string blob
+    players  [players * 2]  (id, name) string indexes, sorted by id
+    assets   [assets * 3]   (filename, description, usable) in catalogue order
+    keys     [assets]       asset row indexes, sorted by filename
+    blob     UTF-8 string data
+"""
+import mmap
+import os
+import struct
+import tempfile
+from collections.abc import Mapping, Set
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+MAGIC = b'SIDX'
+VERSION = 2
+HEADER = struct.Struct('<4sIIII')
+UINT32 = struct.Struct('<I')
+
+
+def _pack_uint32(values: list) -> bytes:
+    return struct.pack(f'<{len(values)}I', *values)
+
+
+def publish_index(path: Path, players: Dict[str, str], assets: Dict[str, str],
+                  usable: Iterable[str] = ()) -> None:
+    """Write player id -> name and asset filename -> description tables.
+
+    ``usable`` names the assets that passed verification. The file is written
+    next to ``path`` and moved into place, so workers that are attached to an
+    older copy keep a consistent view.
+    """
+    usable = set(usable)
+    strings = []
+    string_ids = {}
+
+    def intern(value: str) -> int:
+        if value not in string_ids:
+            string_ids[value] = len(strings)
+            strings.append(value.encode('utf-8'))
+        return string_ids[value]
+
+    player_rows = []
+    for player_id in sorted(players, key=lambda k: k.encode('utf-8')):
+        player_rows.extend((intern(player_id), intern(players[player_id])))
+
+    asset_rows = []
+    for filename, description in assets.items():
+        asset_rows.extend((intern(filename), intern(description), int(filename in usable)))
+    asset_keys = sorted(range(len(assets)), key=lambda row: strings[asset_rows[row * 3]])
+
+    offsets = [0]
+    for encoded in strings:
+        offsets.append(offsets[-1] + len(encoded))
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(strings), len(players), len(assets)))
+            for values in (offsets, player_rows, asset_rows, asset_keys):
+                f.write(_pack_uint32(values))
+            f.write(b''.join(strings))
+        os.replace(tmp_name, path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+
+class _UInt32Array:
+    """Little-endian uint32 array read in place from a buffer"""
+
+    def __init__(self, view: memoryview, start: int, count: int):
+        self._view = view
+        self._start = start
+        self._count = count
+
+    def __getitem__(self, index: int) -> int:
+        return UINT32.unpack_from(self._view, self._start + index * UINT32.size)[0]
+
+    def __len__(self) -> int:
+        return self._count
+
+
+class SharedIndex:
+    """Zero-copy view over a file written by ``publish_index``"""
+
+    def __init__(self, path: Path):
+        with open(path, 'rb') as f:
+            try:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ValueError(f"Not a shared index file: {path}") from None
+        self._view = memoryview(self._mmap)
+
+        if len(self._view) < HEADER.size:
+            self.close()
+            raise ValueError(f"Not a shared index file: {path}")
+        magic, version, n_strings, n_players, n_assets = HEADER.unpack_from(self._view)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"Not a shared index file: {path}")
+
+        start = HEADER.size
+        sections = []
+        for count in (n_strings + 1, n_players * 2, n_assets * 3, n_assets):
+            sections.append(_UInt32Array(self._view, start, count))
+            start += count * UINT32.size
+        if len(self._view) < start:
+            self.close()
+            raise ValueError(f"Truncated shared index file: {path}")
+        self._offsets, self._players, self._assets, self._asset_keys = sections
+        self._blob_start = start
+        if len(self._view) < start + self._offsets[n_strings]:
+            self.close()
+            raise ValueError(f"Truncated shared index file: {path}")
+
+        self.players = PlayerTable(self, n_players)
+        self.assets = AssetTable(self, n_assets)
+        self.usable_assets = UsableAssets(self.assets)
+
+    def _string_slice(self, index: int) -> memoryview:
+        start = self._blob_start + self._offsets[index]
+        end = self._blob_start + self._offsets[index + 1]
+        return self._view[start:end]
+
+    def string(self, index: int) -> str:
+        """Decode one entry of the string table"""
+        return str(self._string_slice(index), 'utf-8')
+
+    def _string_bytes(self, index: int) -> bytes:
+        return bytes(self._string_slice(index))
+
+    def close(self) -> None:
+        """Release the mapping; tables must not be used afterwards"""
+        view = self.__dict__.pop('_view', None)
+        if view is not None:
+            view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _bisect(index: SharedIndex, count: int, key_at, target: str) -> Optional[int]:
+    """Binary search ``count`` sorted string indexes for ``target``"""
+    encoded = target.encode('utf-8')
+    lo, hi = 0, count
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if index._string_bytes(key_at(mid)) < encoded:
+            lo = mid + 1
+        else:
+            hi = mid
+    if lo < count and index._string_bytes(key_at(lo)) == encoded:
+        return lo
+    return None
+
+
+class PlayerTable(Mapping):
+    """Player id -> full name, looked up by binary search over the ids"""
+
+    def __init__(self, index: SharedIndex, count: int):
+        self._index = index
+        self._count = count
+
+    def __getitem__(self, player_id: str) -> str:
+        rows = self._index._players
+        row = None
+        if isinstance(player_id, str):
+            row = _bisect(self._index, self._count, lambda i: rows[i * 2], player_id)
+        if row is None:
+            raise KeyError(player_id)
+        return self._index.string(rows[row * 2 + 1])
+
+    def __iter__(self) -> Iterator[str]:
+        rows = self._index._players
+        for row in range(self._count):
+            yield self._index.string(rows[row * 2])
+
+    def __len__(self) -> int:
+        return self._count
+
+
+class AssetTable(Mapping):
+    """Asset filename -> description; iterates in catalogue order"""
+
+    def __init__(self, index: SharedIndex, count: int):
+        self._index = index
+        self._count = count
+
+    def _row(self, filename: str) -> Optional[int]:
+        if not isinstance(filename, str):
+            return None
+        rows, keys = self._index._assets, self._index._asset_keys
+        found = _bisect(self._index, self._count, lambda i: rows[keys[i] * 3], filename)
+        return None if found is None else keys[found]
+
+    def __getitem__(self, filename: str) -> str:
+        row = self._row(filename)
+        if row is None:
+            raise KeyError(filename)
+        return self._index.string(self._index._assets[row * 3 + 1])
+
+    def is_usable(self, filename: str) -> bool:
+        """True if the asset passed verification when the index was published"""
+        row = self._row(filename)
+        return row is not None and bool(self._index._assets[row * 3 + 2])
+
+    def __iter__(self) -> Iterator[str]:
+        rows = self._index._assets
+        for row in range(self._count):
+            yield self._index.string(rows[row * 3])
+
+    def items(self) -> Iterator[Tuple[str, str]]:
+        rows = self._index._assets
+        for row in range(self._count):
+            yield (self._index.string(rows[row * 3]),
+                   self._index.string(rows[row * 3 + 1]))
+
+    def __len__(self) -> int:
+        return self._count
+
+
+class UsableAssets(Set):
+    """Set view of the asset filenames flagged usable in the index"""
+
+    def __init__(self, assets: AssetTable):
+        self._assets = assets
+
+    def __contains__(self, filename) -> bool:
+        return self._assets.is_usable(filename)
+
+    def __iter__(self) -> Iterator[str]:
+        return (filename for filename in self._assets if filename in self)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
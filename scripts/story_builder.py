@@ -4,16 +4,57 @@ Story Builder - Core class for converting match events into story packs
 import json
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, Iterator, Mapping, Optional
+
+from asset_manifest import build_manifest, is_usable
+from shared_index import SharedIndex, publish_index
+
+COVER_IMAGE = '21521990.jpg'
 
 
 class StoryBuilder:
     """Builds a story pack from match events"""
     
-    def __init__(self, weights_path: Optional[Path] = None):
-        """Initialize with optional weights configuration"""
+    def __init__(self, weights_path: Optional[Path] = None,
+                 manifest_path: Optional[Path] = None,
+                 shared_index_path: Optional[Path] = None):
+        """Initialize with optional weights, manifest cache and shared index.
+
+        Without ``manifest_path`` assets are verified on every construction
+        and nothing is written to disk.
+
+        With ``shared_index_path`` the squad, asset and usability tables are
+        read from a file written by ``publish_shared_index``; assets are not
+        re-verified and nothing is parsed per process. Call ``close`` (or use
+        the builder as a context manager) to release it.
+        """
         self.weights = self._load_weights(weights_path)
-        self.asset_descriptions = self._load_asset_descriptions()
+        self.shared_index = SharedIndex(shared_index_path) if shared_index_path else None
+        if self.shared_index:
+            self.asset_descriptions = self.shared_index.assets
+            self.asset_manifest = {}
+            self.usable_assets = self.shared_index.usable_assets
+        else:
+            self.asset_descriptions = self._load_asset_descriptions()
+            self.asset_manifest = self._load_asset_manifest(manifest_path)
+            self.usable_assets = {
+                filename for filename, entry in self.asset_manifest.items()
+                if is_usable(entry,
+                             self.weights.get('min_image_width', 0),
+                             self.weights.get('min_image_height', 0))
+            }
+    
+    def close(self) -> None:
+        """Release the shared index, if attached"""
+        if self.shared_index:
+            self.shared_index.close()
+            self.shared_index = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
         
     def _load_weights(self, weights_path: Optional[Path]) -> Dict:
         """Load ranking weights from file or use defaults"""
@@ -37,6 +78,11 @@ class StoryBuilder:
                        for asset in data.get('assets', [])}
         return {}
     
+    def _load_asset_manifest(self, manifest_path: Optional[Path]) -> Dict[str, Dict]:
+        """Verify described assets on disk, caching in ``manifest_path`` if given"""
+        assets_path = Path(__file__).parent.parent / 'assets'
+        return build_manifest(assets_path, self.asset_descriptions, manifest_path)
+    
     def _calculate_score(self, event: Dict) -> float:
         """Calculate ranking score for an event"""
         event_type = event.get('type', '')
@@ -67,6 +113,15 @@ class StoryBuilder:
                 event1.get('type') == event2.get('type') and
                 event1.get('playerRef1') == event2.get('playerRef1'))
     
+    def _select_cover_image(self) -> str:
+        """Use the walkout image for the cover, or the first usable asset"""
+        if COVER_IMAGE in self.usable_assets:
+            return f"../assets/{COVER_IMAGE}"
+        for filename in self.asset_descriptions:
+            if filename in self.usable_assets:
+                return f"../assets/{filename}"
+        return "../assets/placeholder.png"
+    
     def _find_matching_image(self, event: Dict, player_name: str, used_images: set) -> str:
         """Find best matching image for an event, avoiding duplicates"""
         event_type = event.get('type', '')
@@ -77,7 +132,7 @@ class StoryBuilder:
         best_score = 0
         
         for filename, description in self.asset_descriptions.items():
-            if filename in used_images:
+            if filename in used_images or filename not in self.usable_assets:
                 continue
                 
             desc_lower = description.lower()
@@ -123,8 +178,8 @@ class StoryBuilder:
             return f"../assets/{best_match}"
         return "../assets/placeholder.png"
         
-    def _get_player_name(self, player_ref: str, squads: Dict) -> str:
-        """Get player name from squad data"""
+    def _iter_players(self, squads: Dict) -> Iterator[Dict]:
+        """Yield player records from squad data, Celtic first"""
         for team_name in ['celtic', 'kilmarnock']:
             team_squad = squads.get(team_name, {})
             
@@ -142,18 +197,28 @@ class StoryBuilder:
                     continue
                 
                 for player in squad_item['person']:
-                    if not isinstance(player, dict):
-                        continue
-                    
-                    if player.get('id') != player_ref:
-                        continue
-                    
-                    first = player.get('firstName', '')
-                    last = player.get('lastName', '')
-                    full_name = f"{first} {last}".strip()
-                    return full_name if full_name else player_ref
-        
-        return player_ref
+                    if isinstance(player, dict):
+                        yield player
+    
+    def _player_names(self, squads: Dict) -> Dict[str, str]:
+        """Map player id to full name; the first squad listing wins"""
+        players = {}
+        for player in self._iter_players(squads):
+            player_id = player.get('id')
+            if player_id and player_id not in players:
+                first = player.get('firstName', '')
+                last = player.get('lastName', '')
+                players[player_id] = f"{first} {last}".strip()
+        return players
+    
+    def _get_player_name(self, player_ref: str, players: Mapping[str, str]) -> str:
+        """Get player name from an id -> name mapping, falling back to the id"""
+        return players.get(player_ref) or player_ref
+    
+    def publish_shared_index(self, path: Path) -> None:
+        """Publish squad, asset and usability tables for workers to attach to"""
+        publish_index(path, self._player_names(self._load_squads()),
+                      dict(self.asset_descriptions.items()), self.usable_assets)
     
     def _create_headline(self, event: Dict, player_name: str) -> str:
         event_type = event.get('type', '')
@@ -193,8 +258,12 @@ class StoryBuilder:
         home_team = next((c['name'] for c in contestants if c.get('position') == 'home'), 'Home')
         away_team = next((c['name'] for c in contestants if c.get('position') == 'away'), 'Away')
         
-        if squads is None:
-            squads = self._load_squads()
+        if squads is not None:
+            players = self._player_names(squads)
+        elif self.shared_index:
+            players = self.shared_index.players
+        else:
+            players = self._player_names(self._load_squads())
         
         scored_events = []
         for event in messages:
@@ -203,7 +272,7 @@ class StoryBuilder:
                 continue
             
             player_ref = event.get('playerRef1', '')
-            player_name = self._get_player_name(player_ref, squads) if player_ref else ''
+            player_name = self._get_player_name(player_ref, players) if player_ref else ''
             
             scored_events.append({
                 'event': event,
@@ -230,7 +299,7 @@ class StoryBuilder:
         
         pages = []
         
-        cover_image = "../assets/21521990.jpg"
+        cover_image = self._select_cover_image()
         pages.append({
             "type": "cover",
             "headline": f"{home_team} vs {away_team}",
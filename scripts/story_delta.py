@@ -0,0 +1,159 @@
+"""
+Story Delta - Compact patches between two versions of a story pack
+"""
+import copy
+import hashlib
+import json
+from typing import Dict, List, Optional
+
+
+def page_key(page: Dict) -> str:
+    """Stable identity for a page, derived from its minute, type and player.
+
+    Highlight headlines are built from the event type and player name, so
+    together with the minute they identify the same moment across rebuilds.
+    """
+    page_type = page.get('type', '')
+    if page_type == 'cover':
+        return 'cover'
+    if page_type == 'highlight':
+        return f"highlight:{page.get('minute', '')}:{page.get('headline', '')}"
+    return f"{page_type}:{page.get('headline', '')}"
+
+
+def pack_fingerprint(pack: Dict) -> str:
+    """SHA-256 of the pack's canonical JSON, ignoring ``created_at``"""
+    content = {k: v for k, v in pack.items() if k != 'created_at'}
+    canonical = json.dumps(content, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def _keyed_pages(pages: List[Dict]) -> List[tuple]:
+    """Pair each page with its key, suffixing repeats so keys stay unique"""
+    seen = {}
+    keyed = []
+    for page in pages:
+        key = page_key(page)
+        count = seen.get(key, 0)
+        seen[key] = count + 1
+        if count:
+            key = f"{key}#{count}"
+        keyed.append((key, page))
+    return keyed
+
+
+def _diff_fields(old: Dict, new: Dict) -> tuple:
+    """Return (changed fields, removed field names) between two dicts"""
+    changed = {k: v for k, v in new.items() if k not in old or old[k] != v}
+    removed = sorted(k for k in old if k not in new)
+    return changed, removed
+
+
+def diff_packs(base: Dict, new: Dict, base_version: int = 0) -> Dict:
+    """Build an ordered patch that turns ``base`` into ``new``.
+
+    Operations are applied in order: removals, then field updates, then
+    inserts at their final index. The content version only moves when a
+    page or a top-level field other than ``created_at`` changes.
+    """
+    base_keyed = _keyed_pages(base.get('pages', []))
+    new_keyed = _keyed_pages(new.get('pages', []))
+    base_index = {key: i for i, (key, _) in enumerate(base_keyed)}
+    base_pages = dict(base_keyed)
+
+    # Keep pages that are still present and still in the same relative
+    # order; anything that moved is sent as a remove + insert.
+    kept = set()
+    last_index = -1
+    for key, _ in new_keyed:
+        index = base_index.get(key)
+        if index is not None and index > last_index:
+            kept.add(key)
+            last_index = index
+
+    ops = []
+    for key, _ in base_keyed:
+        if key not in kept:
+            ops.append({"op": "remove", "key": key})
+
+    for key, page in new_keyed:
+        if key not in kept:
+            continue
+        changed, removed = _diff_fields(base_pages[key], page)
+        if changed or removed:
+            op = {"op": "update", "key": key, "fields": changed}
+            if removed:
+                op["removed"] = removed
+            ops.append(op)
+
+    for index, (key, page) in enumerate(new_keyed):
+        if key not in kept:
+            ops.append({"op": "insert", "index": index, "page": page})
+
+    base_meta = {k: v for k, v in base.items() if k != 'pages'}
+    new_meta = {k: v for k, v in new.items() if k != 'pages'}
+    fields, removed_fields = _diff_fields(base_meta, new_meta)
+
+    content_changed = bool(ops) or bool(removed_fields) or any(
+        k != 'created_at' for k in fields
+    )
+
+    patch = {
+        "pack_id": new.get('pack_id'),
+        "base_version": base_version,
+        "version": base_version + 1 if content_changed else base_version,
+        "base_fingerprint": pack_fingerprint(base),
+        "fingerprint": pack_fingerprint(new),
+        "fields": fields,
+        "ops": ops
+    }
+    if removed_fields:
+        patch["removed_fields"] = removed_fields
+    return patch
+
+
+def apply_patch(base: Dict, patch: Dict) -> Dict:
+    """Rebuild the full pack from ``base`` and a patch from ``diff_packs``.
+
+    Raises ValueError if ``base`` is not the pack the patch was made against.
+    """
+    if patch.get('base_fingerprint') != pack_fingerprint(base):
+        raise ValueError(
+            f"Patch base does not match pack (expected version {patch.get('base_version')})"
+        )
+    pack = copy.deepcopy(base)
+    for field in patch.get('removed_fields', []):
+        pack.pop(field, None)
+    pack.update(copy.deepcopy(patch.get('fields', {})))
+
+    keyed = _keyed_pages(pack.get('pages', []))
+    for op in patch.get('ops', []):
+        if op['op'] == 'remove':
+            keyed = [(k, p) for k, p in keyed if k != op['key']]
+        elif op['op'] == 'update':
+            page = next((p for k, p in keyed if k == op['key']), None)
+            if page is None:
+                raise ValueError(f"Patch updates unknown page: {op['key']}")
+            for field in op.get('removed', []):
+                page.pop(field, None)
+            page.update(copy.deepcopy(op['fields']))
+        elif op['op'] == 'insert':
+            keyed.insert(op['index'], (None, copy.deepcopy(op['page'])))
+        else:
+            raise ValueError(f"Unknown patch operation: {op['op']}")
+
+    pack['pages'] = [p for _, p in keyed]
+    return pack
+
+
+def next_base_version(previous_patch: Optional[Dict], previous_pack: Dict) -> int:
+    """Content version of the previously written pack, or 0 if unknown.
+
+    The version is only carried over when the previous patch produced exactly
+    ``previous_pack``; if the pack was rewritten some other way it starts over.
+    """
+    if (previous_patch
+            and previous_patch.get('pack_id') == previous_pack.get('pack_id')
+            and previous_patch.get('fingerprint') == pack_fingerprint(previous_pack)):
+        return int(previous_patch.get('version', 0))
+    return 0
@@ -8,6 +8,10 @@ import sys
 sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts'))
 
 from story_builder import StoryBuilder
+from story_delta import diff_packs, apply_patch, next_base_version
+import build_story
+from asset_manifest import build_manifest, is_usable
+from shared_index import SharedIndex, publish_index
 
 
 @pytest.fixture
@@ -26,10 +30,10 @@ def sample_events():
 
 
 @pytest.fixture
-def builder():
+def builder(tmp_path):
     """Create a StoryBuilder instance"""
     weights_path = Path(__file__).parent.parent / 'weights.example.json'
-    return StoryBuilder(weights_path)
+    return StoryBuilder(weights_path, manifest_path=tmp_path / 'asset_manifest.json')
 
 
 class TestInvariants:
@@ -237,6 +241,251 @@ class TestRanking:
             assert goal_index < shot_index, "Goal should rank higher than shot"
 
 
+class TestDelta:
+    """Tests for pack patches between rebuilds"""
+    
+    def test_patch_round_trips_changed_pack(self, builder, sample_events):
+        """Applying the patch to the base pack rebuilds the new pack exactly"""
+        base = builder.build_story(sample_events)
+        new = json.loads(json.dumps(base))
+        
+        removed = new['pages'].pop(2)
+        new['pages'][1]['caption'] = 'Updated caption'
+        new['pages'].insert(3, {"type": "highlight", "minute": 60, "headline": "SAVE — Keeper",
+                                "caption": "Saved", "image": "../assets/placeholder.png"})
+        new['created_at'] = '2030-01-01T00:00:00Z'
+        
+        patch = diff_packs(base, new, base_version=3)
+        
+        assert patch['version'] == 4
+        assert {"op": "remove", "key": f"highlight:{removed['minute']}:{removed['headline']}"} in patch['ops']
+        assert apply_patch(base, patch) == new
+    
+    def test_created_at_only_keeps_version(self, builder, sample_events):
+        """A rebuild that only moves created_at has no page ops and keeps the version"""
+        base = builder.build_story(sample_events)
+        new = dict(base, created_at='2030-01-01T00:00:00Z')
+        
+        patch = diff_packs(base, new, base_version=2)
+        
+        assert patch['ops'] == []
+        assert patch['version'] == 2
+        assert apply_patch(base, patch) == new
+    
+    def test_patch_rejects_wrong_base(self, builder, sample_events):
+        """A patch cannot be applied to a pack other than its base"""
+        base = builder.build_story(sample_events)
+        new = json.loads(json.dumps(base))
+        new['pages'][1]['caption'] = 'Updated caption'
+        patch = diff_packs(base, new)
+        
+        with pytest.raises(ValueError):
+            apply_patch(new, patch)
+    
+    def test_next_base_version_requires_matching_pack(self, builder, sample_events):
+        """The version carries over only for the same pack_id and content"""
+        base = builder.build_story(sample_events)
+        new = json.loads(json.dumps(base))
+        new['pages'][1]['caption'] = 'Updated caption'
+        patch = diff_packs(base, new, base_version=4)
+        
+        assert next_base_version(patch, new) == 5
+        assert next_base_version(patch, dict(new, pack_id='other')) == 0
+        assert next_base_version(patch, base) == 0
+        assert next_base_version(None, new) == 0
+    
+    def test_delta_runs_chain_versions(self, tmp_path, monkeypatch, capsys):
+        """Consecutive --delta builds carry the version from patch to patch"""
+        output_path = tmp_path / 'story.json'
+        patch_path = tmp_path / 'story.patch.json'
+        argv = ['build_story.py', '--delta', '--output', str(output_path),
+                '--patch-output', str(patch_path),
+                '--asset-manifest', str(tmp_path / 'asset_manifest.json')]
+        monkeypatch.setattr(sys, 'argv', argv)
+        
+        def run():
+            build_story.main()
+            return json.loads(patch_path.read_text())
+        
+        def edit_story():
+            story = json.loads(output_path.read_text())
+            story['pages'][1]['caption'] = 'Edited elsewhere'
+            output_path.write_text(json.dumps(story))
+        
+        build_story.main()
+        assert not patch_path.exists()
+        assert 'No previous pack' in capsys.readouterr().out
+        
+        edit_story()
+        first = run()
+        assert (first['base_version'], first['version']) == (0, 1)
+        
+        second = run()
+        assert (second['base_version'], second['version']) == (1, 1)
+        assert second['base_fingerprint'] == first['fingerprint']
+        
+        # Rewritten outside --delta: the stale version must not be reused
+        edit_story()
+        third = run()
+        assert (third['base_version'], third['version']) == (0, 1)
+
+
+    
+    def test_delta_survives_corrupt_previous_files(self, tmp_path, monkeypatch, capsys):
+        """Unreadable previous pack or patch never stops the build"""
+        output_path = tmp_path / 'story.json'
+        patch_path = tmp_path / 'story.patch.json'
+        argv = ['build_story.py', '--delta', '--output', str(output_path),
+                '--patch-output', str(patch_path),
+                '--asset-manifest', str(tmp_path / 'asset_manifest.json')]
+        monkeypatch.setattr(sys, 'argv', argv)
+        
+        output_path.write_text('{')
+        build_story.main()
+        assert 'unreadable' in capsys.readouterr().out
+        assert json.loads(output_path.read_text())['pages'][0]['type'] == 'cover'
+        assert not patch_path.exists()
+        
+        patch_path.write_text('{')
+        build_story.main()
+        patch = json.loads(patch_path.read_text())
+        assert patch['base_version'] == 0
+
+
+class TestAssetManifest:
+    """Tests for asset verification and the cached manifest"""
+    
+    def test_manifest_records_dimensions_and_missing_files(self, tmp_path):
+        """Real images get their header dimensions; missing files are flagged"""
+        assets_dir = Path(__file__).parent.parent / 'assets'
+        manifest = build_manifest(assets_dir, ['21521989.jpg', 'placeholder.png', 'missing.jpg'],
+                                  tmp_path / 'manifest.json')
+        
+        assert (manifest['21521989.jpg']['width'], manifest['21521989.jpg']['height']) == (800, 500)
+        assert (manifest['placeholder.png']['width'], manifest['placeholder.png']['height']) == (1, 1)
+        assert manifest['missing.jpg'] == {"exists": False}
+        assert is_usable(manifest['21521989.jpg'], 320, 200)
+        assert not is_usable(manifest['placeholder.png'], 320, 200)
+        assert not is_usable(manifest['missing.jpg'])
+    
+    def test_manifest_refreshes_by_mtime(self, tmp_path):
+        """Unchanged files reuse the cached entry; modified files are re-read"""
+        source = Path(__file__).parent.parent / 'assets' / 'placeholder.png'
+        image = tmp_path / 'image.png'
+        image.write_bytes(source.read_bytes())
+        cache_path = tmp_path / 'manifest.json'
+        
+        first = build_manifest(tmp_path, ['image.png'], cache_path)
+        
+        cached = json.loads(cache_path.read_text())
+        cached['assets']['image.png']['sha256'] = 'from-cache'
+        cache_path.write_text(json.dumps(cached))
+        assert build_manifest(tmp_path, ['image.png'], cache_path)['image.png']['sha256'] == 'from-cache'
+        
+        image.write_bytes(b'not an image')
+        refreshed = build_manifest(tmp_path, ['image.png'], cache_path)['image.png']
+        assert refreshed['width'] is None
+        assert refreshed['sha256'] != first['image.png']['sha256']
+        assert not is_usable(refreshed)
+    
+    def test_unusable_assets_are_not_matched(self, builder):
+        """_find_matching_image skips assets the manifest marks as unusable"""
+        event = {"type": "end 2", "comment": ""}
+        best = builder._find_matching_image(event, '', set())
+        assert best != "../assets/placeholder.png"
+        
+        builder.usable_assets.discard(best[len("../assets/"):])
+        assert builder._find_matching_image(event, '', set()) != best
+    
+    def test_cover_falls_back_when_image_unusable(self, builder, sample_events):
+        """The cover never points at an asset the manifest marks as unusable"""
+        cover = builder.build_story(sample_events)['pages'][0]
+        assert cover['image'] == '../assets/21521990.jpg'
+        
+        builder.usable_assets.discard('21521990.jpg')
+        cover = builder.build_story(sample_events)['pages'][0]
+        assert cover['image'] != '../assets/21521990.jpg'
+        assert cover['image'][len('../assets/'):] in builder.usable_assets
+    
+    def test_cache_write_leaves_no_temp_files(self, tmp_path):
+        """The cache is moved into place, leaving only the manifest behind"""
+        assets_dir = Path(__file__).parent.parent / 'assets'
+        cache_path = tmp_path / 'manifest.json'
+        build_manifest(assets_dir, ['placeholder.png'], cache_path)
+        
+        assert [p.name for p in tmp_path.iterdir()] == ['manifest.json']
+        assert 'placeholder.png' in json.loads(cache_path.read_text())['assets']
+
+
+class TestSharedIndex:
+    """Tests for the shared squad and asset index"""
+    
+    def test_tables_round_trip(self, tmp_path):
+        """Published players and assets read back unchanged, in catalogue order"""
+        index_path = tmp_path / 'index.bin'
+        players = {"p2": "Zoë Ünal", "p10": "Ann Lee", "p1": ""}
+        assets = {"b.jpg": "Second", "a.jpg": "First — with a dash", "c.jpg": "Third"}
+        publish_index(index_path, players, assets, usable={"a.jpg", "c.jpg"})
+        
+        with SharedIndex(index_path) as index:
+            assert dict(index.players) == players
+            assert index.players.get("p2") == "Zoë Ünal"
+            assert index.players.get("missing") is None
+            assert list(index.assets.items()) == list(assets.items())
+            assert index.assets["c.jpg"] == "Third"
+            assert "b.jpg" in index.assets and "d.jpg" not in index.assets
+            assert set(index.usable_assets) == {"a.jpg", "c.jpg"}
+            assert "b.jpg" not in index.usable_assets
+    
+    def test_truncated_file_is_rejected(self, tmp_path):
+        """Short or empty files raise ValueError instead of struct errors"""
+        index_path = tmp_path / 'index.bin'
+        publish_index(index_path, {"p1": "Ann Lee"}, {"a.jpg": "First"})
+        data = index_path.read_bytes()
+        
+        for length in (0, 10, len(data) - 1):
+            index_path.write_bytes(data[:length])
+            with pytest.raises(ValueError):
+                SharedIndex(index_path)
+    
+    def test_attached_builder_matches_parsed_builder(self, builder, sample_events, tmp_path, monkeypatch):
+        """A builder attached to a published index produces the same pages without re-verifying assets"""
+        index_path = tmp_path / 'index.bin'
+        builder.usable_assets.discard('21522057.jpg')
+        builder.publish_shared_index(index_path)
+        expected = builder.build_story(sample_events)['pages']
+        
+        def fail(*args, **kwargs):
+            raise AssertionError("attached builders must not build the asset manifest")
+        monkeypatch.setattr('story_builder.build_manifest', fail)
+        
+        weights_path = Path(__file__).parent.parent / 'weights.example.json'
+        with StoryBuilder(weights_path, shared_index_path=index_path) as attached:
+            assert '21522057.jpg' not in attached.usable_assets
+            assert attached.build_story(sample_events)['pages'] == expected
+        assert attached.shared_index is None
+
+
+    
+    def test_publish_leaves_no_temp_files(self, tmp_path):
+        """Publishing moves a uniquely named temp file into place"""
+        publish_index(tmp_path / 'index.bin', {"p1": "Ann Lee"}, {"a.jpg": "First"})
+        assert [p.name for p in tmp_path.iterdir()] == ['index.bin']
+    
+    def test_cli_reports_invalid_index(self, tmp_path, monkeypatch, capsys):
+        """A junk --shared-index file is reported as an error, not a traceback"""
+        index_path = tmp_path / 'index.bin'
+        index_path.write_bytes(b'not an index')
+        output_path = tmp_path / 'story.json'
+        monkeypatch.setattr(sys, 'argv', [
+            'build_story.py', '--shared-index', str(index_path), '--output', str(output_path),
+            '--asset-manifest', str(tmp_path / 'asset_manifest.json')])
+        
+        assert build_story.main() == 1
+        assert 'Error: Not a shared index file' in capsys.readouterr().out
+        assert not output_path.exists()
+
+
 class TestNegativeCases:
     """Negative test cases"""
     